@@ -3,6 +3,7 @@ from __future__ import annotations
 
 import json
 import logging
+import time
 from collections.abc import Mapping
 from datetime import date, datetime, timedelta
 from typing import Any
@@ -27,11 +28,18 @@ from .const import (
     DEFAULT_OPTIONS,
     DOMAIN,
     SCAN_INTERVAL,
+    SESSION_REUSE_TIMEOUT,
     SIGNAL_NAME_PREFIX,
 )
 from .notify import *
 from .services import async_setup_services
-from .utils import compact_list, get_schoolyear, async_notify
+from .utils import (
+    async_notify,
+    compact_list,
+    create_http_session,
+    get_schoolyear,
+    get_schoolyears,
+)
 
 PLATFORMS = [Platform.BINARY_SENSOR, Platform.SENSOR, Platform.CALENDAR]
 
@@ -51,7 +59,20 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         entry.data["school"],
     )
 
-    server = WebUntis(hass, unique_id, entry)
+    # Reuse the session logged in by the config flow if it is still fresh.
+    session = None
+    pending = domain_data.pop(unique_id, None)
+    if isinstance(pending, tuple):
+        logged_in_at, pending_session = pending
+        if time.monotonic() - logged_in_at < SESSION_REUSE_TIMEOUT:
+            session = pending_session
+        else:
+            try:
+                await hass.async_add_executor_job(pending_session.logout)
+            except Exception as error:  # pylint: disable=broad-except
+                _LOGGER.debug("Logout of stale config flow session failed: %s", error)
+
+    server = WebUntis(hass, unique_id, entry, session)
     domain_data[unique_id] = server
     await server.async_update()
     server.start_periodic_update()
@@ -115,6 +136,7 @@ class WebUntis:
         hass: HomeAssistant,
         unique_id: str,
         config: Mapping[str, Any],
+        session: webuntis.Session | None = None,
     ) -> None:
         """Initialize client instance."""
         self._hass = hass
@@ -154,15 +176,22 @@ class WebUntis:
         self.notify_target = config.options.get("notify_target")
         self.notify_data = config.options.get("notify_data")
 
-        # pylint: disable=maybe-no-member
-        self.session = webuntis.Session(
-            username=self.username,
-            password=self.password,
-            server=self.server,
-            useragent="foo",
-            school=self.school,
-        )
-        self._loged_in = False
+        if session is None:
+            # pylint: disable=maybe-no-member
+            session = webuntis.Session(
+                username=self.username,
+                password=self.password,
+                server=self.server,
+                useragent="foo",
+                school=self.school,
+                _http_session=create_http_session(),
+            )
+            self._loged_in = False
+        else:
+            self._loged_in = True
+        self.session = session
+        # A session handed over by the config flow was just logged in.
+        self._fresh_session = self._loged_in
         self._last_status_request_failed = False
         self.updating = 0
         self.issue = False
@@ -180,6 +209,8 @@ class WebUntis:
         self.today = [None, None]
 
         self.subjects = []
+        self.klassen_by_name = None
+        self._klassen_school_year = None
 
         self.event_list = []
         self.event_list_old = []
@@ -222,7 +253,7 @@ class WebUntis:
 
         try:
             self.school_year = await self._hass.async_add_executor_job(
-                self.session.schoolyears
+                get_schoolyears, self.session
             )
 
             valid_schoolyear = await self._hass.async_add_executor_job(
@@ -366,6 +397,11 @@ class WebUntis:
 
     def webuntis_login(self):
         if self._loged_in:
+            if self._fresh_session:
+                # Skip the validity check once for a handed over session.
+                self._fresh_session = False
+                self.updating += 1
+                return True
             # Check if there is a session id.
             if "jsessionid" not in self.session.config:
                 _LOGGER.debug("No session id found")
@@ -455,9 +491,7 @@ class WebUntis:
                 self.timetable_source_id[1], self.timetable_source_id[0]
             )
         elif self.timetable_source == "klasse":
-            klassen = self.session.klassen()
-            # pylint: disable=maybe-no-member
-            source = klassen.filter(name=self.timetable_source_id)[0]
+            source = self._get_klasse()
         elif self.timetable_source == "teacher":
             source = self.session.get_teacher(
                 self.timetable_source_id[1], self.timetable_source_id[0]
@@ -469,6 +503,22 @@ class WebUntis:
 
         return {self.timetable_source: source}
 
+    def _get_klasse(self):
+        """return the class, rebuilding the lookup for a new school year"""
+        school_year = get_schoolyear(self.school_year or [], date.today())
+        school_year_id = school_year.id if school_year else None
+
+        if (
+            self.klassen_by_name is None
+            or self._klassen_school_year != school_year_id
+            or self.timetable_source_id not in self.klassen_by_name
+        ):
+            klassen = self.session.klassen()
+            self.klassen_by_name = {klasse.name: klasse for klasse in klassen}
+            self._klassen_school_year = school_year_id
+
+        return self.klassen_by_name[self.timetable_source_id]
+
     def get_timetable(self, start, end: datetime):
         """Get the timetable for the given time period"""
         timetable_object = self.get_timetable_object()
@@ -1,13 +1,16 @@
 """Config flow for webuntisnew integration."""
 from __future__ import annotations
 
+import asyncio
 import datetime
+import functools
 import logging
 import socket
+import time
 from typing import Any
 from urllib.parse import urlparse
 
-from .utils import get_schoolyear
+from .utils import create_http_session, get_schoolyear, get_schoolyears
 
 import requests
 import voluptuous as vol
@@ -19,11 +22,112 @@ from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers import selector
 
 
-from .const import CONFIG_ENTRY_VERSION, DEFAULT_OPTIONS, DOMAIN, NOTIFY_OPTIONS
+from .const import (
+    CONFIG_ENTRY_VERSION,
+    DEFAULT_OPTIONS,
+    DOMAIN,
+    NOTIFY_OPTIONS,
+    NOTIFY_OPTIONS_SET,
+)
 from .utils import is_service, async_notify
 
 _LOGGER = logging.getLogger(__name__)
 
+DNS_CACHE_TTL = 300  # 5min
+
+_DNS_CACHE: dict[str, tuple[float, list]] = {}
+
+# Subject names per entry, valid as long as server.subjects is the same list.
+_SUBJECT_CACHE: dict[str, tuple[list, list[str]]] = {}
+
+_DROPDOWN = selector.SelectSelectorMode.DROPDOWN
+
+# Selectors without dynamic parts, shared by every form render.
+_TIMETABLE_SOURCE_SELECTOR = selector.SelectSelector(
+    selector.SelectSelectorConfig(
+        options=[
+            "student",
+            "klasse",
+            "teacher",
+        ],  # "subject", "room"
+        mode=_DROPDOWN,
+    )
+)
+_FILTER_MODE_SELECTOR = selector.SelectSelector(
+    selector.SelectSelectorConfig(
+        options=[
+            "None",
+            "Blacklist",
+            "Whitelist",
+        ],
+        mode=_DROPDOWN,
+    )
+)
+_CALENDAR_DESCRIPTION_SELECTOR = selector.SelectSelector(
+    selector.SelectSelectorConfig(
+        options=[
+            "None",
+            "JSON",
+            "Lesson Info",
+        ],
+        mode=_DROPDOWN,
+    )
+)
+_CALENDAR_ROOM_SELECTOR = selector.SelectSelector(
+    selector.SelectSelectorConfig(
+        options=[
+            "Room long name",
+            "Room short name",
+            "Room short-long name",
+            "None",
+        ],
+        mode=_DROPDOWN,
+    )
+)
+_EXCLUDE_DATA_SELECTOR = selector.SelectSelector(
+    selector.SelectSelectorConfig(
+        options=["teachers"],
+        multiple=True,
+        mode=_DROPDOWN,
+    ),
+)
+_TESTS_SELECTOR = selector.SelectSelector(
+    selector.SelectSelectorConfig(options=["notify"])
+)
+_BOOLEAN_SELECTOR = selector.BooleanSelector()
+_TEXT_SELECTOR = selector.TextSelector()
+_MULTILINE_TEXT_SELECTOR = selector.TextSelector(
+    selector.TextSelectorConfig(multiline=True)
+)
+_OBJECT_SELECTOR = selector.ObjectSelector()
+
+
+async def _resolve_cached(hass: HomeAssistant, host: str, ttl: int = DNS_CACHE_TTL):
+    """Resolve a hostname, reusing a recent result if there is one."""
+    cached = _DNS_CACHE.get(host)
+    if cached and time.monotonic() - cached[0] < ttl:
+        return cached[1]
+
+    addresses = await hass.loop.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+    _DNS_CACHE[host] = (time.monotonic(), addresses)
+    return addresses
+
+
+# Characters that need urlparse to get the hostname out of the server url.
+_URL_SPECIAL_CHARS = frozenset("/:?#@ \t\n\r")
+
+
+@functools.lru_cache(maxsize=256)
+def _normalize_server(server: str) -> str:
+    """Return the hostname of the entered server url."""
+    server = server.strip()
+    if _URL_SPECIAL_CHARS.isdisjoint(server):
+        # Bare hostname like "myschool.webuntis.com"
+        return server
+    if not server.startswith(("http://", "https://")):
+        server = "https://" + server
+    return urlparse(server).netloc
+
 
 async def validate_input(
     hass: HomeAssistant, user_input: dict[str, Any]
@@ -36,19 +140,17 @@ async def validate_input(
     if user_input["timetable_source"] in ["student", "teacher"] and isinstance(
         user_input["timetable_source_id"], str
     ):
-        for char in [",", " "]:
-            split = user_input["timetable_source_id"].split(char)
-            if len(split) == 2:
-                break
-        if len(split) == 2:
-            user_input["timetable_source_id"] = [
-                split.strip(" ").capitalize() for split in split
-            ]
-        else:
+        name = user_input["timetable_source_id"].strip()
+        # "Lastname, Firstname" or "Lastname Firstname"
+        parts = name.split(",") if "," in name else name.split()
+        if len(parts) != 2:
             raise NameSplitError
+        user_input["timetable_source_id"] = [
+            part.strip().capitalize() for part in parts
+        ]
 
     try:
-        socket.gethostbyname(user_input["server"])
+        await _resolve_cached(hass, user_input["server"])
     except Exception as exc:
         _LOGGER.error(f"Cannot resolve hostname: {exc}")
         raise CannotConnect from exc
@@ -61,6 +163,7 @@ async def validate_input(
             username=user_input["username"],
             password=user_input["password"],
             useragent="foo",
+            _http_session=create_http_session(),
         )
         await hass.async_add_executor_job(session.login)
     except webuntis.errors.BadCredentialsError as ext:
@@ -76,6 +179,31 @@ async def validate_input(
     timetable_source_id = user_input["timetable_source_id"]
     timetable_source = user_input["timetable_source"]
 
+    # Fetch the school years while the timetable source is looked up.
+    source, school_years = await asyncio.gather(
+        _async_get_source(hass, session, timetable_source, timetable_source_id),
+        hass.async_add_executor_job(get_schoolyears, session),
+        return_exceptions=True,
+    )
+    if isinstance(source, Exception):
+        raise source
+
+    try:
+        if isinstance(school_years, Exception):
+            raise school_years
+        await hass.async_add_executor_job(
+            test_timetable, session, timetable_source, source, school_years
+        )
+    except Exception as exc:
+        raise NoRightsForTimetable from exc
+
+    return {"title": user_input["username"], "session": session}
+
+
+async def _async_get_source(hass, session, timetable_source, timetable_source_id):
+    """Look up the object the timetable is requested for."""
+    source = None
+
     if timetable_source == "student":
         try:
             source = await hass.async_add_executor_job(
@@ -101,20 +229,12 @@ async def validate_input(
     elif timetable_source == "room":
         pass
 
-    try:
-        await hass.async_add_executor_job(
-            test_timetable, session, timetable_source, source
-        )
-    except Exception as exc:
-        raise NoRightsForTimetable from exc
-
-    return {"title": user_input["username"]}
+    return source
 
 
-def test_timetable(session, timetable_source, source):
+def test_timetable(session, timetable_source, source, school_years):
     """test if timetable is allowed to be fetched"""
     day = datetime.date.today()
-    school_years = session.schoolyears()
     if not get_schoolyear(school_year=school_years):
         day = school_years[-1].start.date()
     session.timetable(start=day, end=day, **{timetable_source: source})
@@ -141,45 +261,30 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             # return self.async_step_optional()
             return self._show_form_user()
 
-        await self.async_set_unique_id(
-            # pylint: disable=consider-using-f-string
-            "{username}@{timetable_source_id}@{school}".format(**user_input)
-            .lower()
-            .replace(" ", "-")
+        unique_id = (
+            f'{user_input["username"]}@{user_input["timetable_source_id"]}'
+            f'@{user_input["school"]}'
         )
+        await self.async_set_unique_id(unique_id.lower().replace(" ", "-"))
         self._abort_if_unique_id_configured()
 
         errors = {}
 
-        if not user_input["server"].startswith(("http://", "https://")):
-            user_input["server"] = "https://" + user_input["server"]
-        user_input["server"] = urlparse(user_input["server"]).netloc
+        user_input["server"] = _normalize_server(user_input["server"])
 
         try:
             info = await validate_input(self.hass, user_input)
-        except CannotConnect:
-            errors["base"] = "cannot_connect"
-        except InvalidAuth:
-            errors["base"] = "invalid_auth"
-        except BadCredentials:
-            errors["base"] = "bad_credentials"
-        except SchoolNotFound:
-            errors["base"] = "school_not_found"
-        except NameSplitError:
-            errors["base"] = "name_split_error"
-        except StudentNotFound:
-            errors["base"] = "student_not_found"
-        except TeacherNotFound:
-            errors["base"] = "teacher_not_found"
-        except ClassNotFound:
-            errors["base"] = "class_not_found"
-        except NoRightsForTimetable:
-            errors["base"] = "no_rights_for_timetable"
-
+        except _HANDLED_ERRORS as exc:
+            errors["base"] = _ERROR_MAP[type(exc)]
         except Exception:  # pylint: disable=broad-except
             _LOGGER.exception("Unexpected exception")
             errors["base"] = "unknown"
         else:
+            # Hand the logged in session over to async_setup_entry.
+            self.hass.data.setdefault(DOMAIN, {})[self.unique_id] = (
+                time.monotonic(),
+                info["session"],
+            )
             return self.async_create_entry(
                 title=info["title"],
                 data=user_input,
@@ -218,16 +323,7 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                     ): str,
                     vol.Required(
                         "timetable_source", default=user_input.get("timetable_source")
-                    ): selector.SelectSelector(
-                        selector.SelectSelectorConfig(
-                            options=[
-                                "student",
-                                "klasse",
-                                "teacher",
-                            ],  # "subject", "room"
-                            mode="dropdown",
-                        )
-                    ),
+                    ): _TIMETABLE_SOURCE_SELECTOR,
                     vol.Required(
                         "timetable_source_id",
                         default=user_input.get("timetable_source_id", ""),
@@ -262,8 +358,8 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
     async def save(self, user_input):
         """Save the options"""
         _LOGGER.debug("Saving options: %s", user_input)
-        options = dict(self.config_entry.options)  # old options
-        options.update(user_input)  # update old options with new options
+        # old options updated with new options
+        options = {**self.config_entry.options, **user_input}
         return self.async_create_entry(title="", data=options)
 
     async def async_step_filter(self, user_input: dict[str, str] = None) -> FlowResult:
@@ -277,16 +373,15 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
 
             if user_input["filter_description"]:
                 user_input["extended_timetable"] = True
-                user_input["filter_description"] = user_input[
-                    "filter_description"
-                ].split(",")
+                raw = user_input["filter_description"]
                 user_input["filter_description"] = [
-                    s.strip() for s in user_input["filter_description"] if s != ""
+                    t for t in (s.strip() for s in raw.split(",")) if t
                 ]
 
             return await self.save(user_input)
 
         server = self.hass.data[DOMAIN][self.config_entry.unique_id]
+        subject_list = _create_subject_list(server, self.config_entry.unique_id)
 
         return self.async_show_form(
             step_id="filter",
@@ -295,24 +390,15 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                     vol.Required(
                         "filter_mode",
                         default=str(self.config_entry.options.get("filter_mode")),
-                    ): selector.SelectSelector(
-                        selector.SelectSelectorConfig(
-                            options=[
-                                "None",
-                                "Blacklist",
-                                "Whitelist",
-                            ],
-                            mode="dropdown",
-                        )
-                    ),
+                    ): _FILTER_MODE_SELECTOR,
                     vol.Required(
                         "filter_subjects",
                         default=self.config_entry.options.get("filter_subjects"),
                     ): selector.SelectSelector(
                         selector.SelectSelectorConfig(
-                            options=_create_subject_list(server),
+                            options=subject_list,
                             multiple=True,
-                            mode=selector.SelectSelectorMode.DROPDOWN,
+                            mode=_DROPDOWN,
                         ),
                     ),
                     vol.Optional(
@@ -322,9 +408,7 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                                 self.config_entry.options.get("filter_description")
                             )
                         },
-                    ): selector.TextSelector(
-                        selector.TextSelectorConfig(multiline=True)
-                    ),
+                    ): _MULTILINE_TEXT_SELECTOR,
                 }
             ),
         )
@@ -346,48 +430,29 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                     vol.Required(
                         "calendar_long_name",
                         default=self.config_entry.options.get("calendar_long_name"),
-                    ): selector.BooleanSelector(),
+                    ): _BOOLEAN_SELECTOR,
                     vol.Required(
                         "calendar_show_cancelled_lessons",
                         default=self.config_entry.options.get(
                             "calendar_show_cancelled_lessons"
                         ),
-                    ): selector.BooleanSelector(),
+                    ): _BOOLEAN_SELECTOR,
                     vol.Required(
                         "calendar_show_room_change",
                         default=self.config_entry.options.get(
                             "calendar_show_room_change"
                         ),
-                    ): selector.BooleanSelector(),
+                    ): _BOOLEAN_SELECTOR,
                     vol.Required(
                         "calendar_description",
                         default=str(
                             self.config_entry.options.get("calendar_description")
                         ),
-                    ): selector.SelectSelector(
-                        selector.SelectSelectorConfig(
-                            options=[
-                                "None",
-                                "JSON",
-                                "Lesson Info",
-                            ],
-                            mode="dropdown",
-                        )
-                    ),
+                    ): _CALENDAR_DESCRIPTION_SELECTOR,
                     vol.Required(
                         "calendar_room",
                         default=str(self.config_entry.options.get("calendar_room")),
-                    ): selector.SelectSelector(
-                        selector.SelectSelectorConfig(
-                            options=[
-                                "Room long name",
-                                "Room short name",
-                                "Room short-long name",
-                                "None",
-                            ],
-                            mode="dropdown",
-                        )
-                    ),
+                    ): _CALENDAR_ROOM_SELECTOR,
                 }
             ),
         )
@@ -399,14 +464,11 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
     ) -> FlowResult:
         """Manage the backend options."""
         if user_input is not None:
-            if (
-                not user_input["extended_timetable"]
-                and self.config_entry.options["filter_description"]
-            ):
-                errors = {"base": "extended_timetable"}
-            elif (
-                user_input["extended_timetable"] is False
-                and self.config_entry.options["calendar_description"] == "Lesson Info"
+            options = self.config_entry.options
+            # Description filter and lesson info need the extended timetable.
+            if not user_input["extended_timetable"] and (
+                options["filter_description"]
+                or options["calendar_description"] == "Lesson Info"
             ):
                 errors = {"base": "extended_timetable"}
             else:
@@ -418,25 +480,19 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                     vol.Required(
                         "keep_loged_in",
                         default=self.config_entry.options.get("keep_loged_in"),
-                    ): selector.BooleanSelector(),
+                    ): _BOOLEAN_SELECTOR,
                     vol.Required(
                         "generate_json",
                         default=self.config_entry.options.get("generate_json"),
-                    ): selector.BooleanSelector(),
+                    ): _BOOLEAN_SELECTOR,
                     vol.Required(
                         "exclude_data",
                         default=self.config_entry.options.get("exclude_data"),
-                    ): selector.SelectSelector(
-                        selector.SelectSelectorConfig(
-                            options=["teachers"],
-                            multiple=True,
-                            mode=selector.SelectSelectorMode.DROPDOWN,
-                        ),
-                    ),
+                    ): _EXCLUDE_DATA_SELECTOR,
                     vol.Required(
                         "extended_timetable",
                         default=self.config_entry.options.get("extended_timetable"),
-                    ): selector.BooleanSelector(),
+                    ): _BOOLEAN_SELECTOR,
                 }
             ),
             errors=errors,
@@ -449,16 +505,15 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
     ) -> FlowResult:
         """Manage the notify options."""
         if user_input is not None:
-            notify_options = [
-                key
-                for key, value in user_input.items()
-                if value and key in NOTIFY_OPTIONS
-            ]
-            user_input = {
-                key: value
-                for key, value in user_input.items()
-                if key not in NOTIFY_OPTIONS
-            }
+            notify_options = []
+            kept = {}
+            for key, value in user_input.items():
+                if key in NOTIFY_OPTIONS_SET:
+                    if value:
+                        notify_options.append(key)
+                else:
+                    kept[key] = value
+            user_input = kept
             user_input["notify_options"] = notify_options
 
             if "notify_entity_id" in user_input:
@@ -478,28 +533,24 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                 description={
                     "suggested_value": self.config_entry.options.get("notify_entity_id")
                 },
-            ): selector.TextSelector(),
+            ): _TEXT_SELECTOR,
             vol.Optional(
                 "notify_target",
                 description={
                     "suggested_value": self.config_entry.options.get("notify_target")
                 },
-            ): selector.ObjectSelector(),
+            ): _OBJECT_SELECTOR,
             vol.Optional(
                 "notify_data",
                 description={
                     "suggested_value": self.config_entry.options.get("notify_data")
                 },
-            ): selector.ObjectSelector(),
+            ): _OBJECT_SELECTOR,
         }
 
+        enabled = frozenset(self.config_entry.options["notify_options"])
         for option in NOTIFY_OPTIONS:
-            schema_options[
-                vol.Optional(
-                    option,
-                    default=option in self.config_entry.options["notify_options"],
-                )
-            ] = bool
+            schema_options[vol.Optional(option, default=option in enabled)] = bool
 
         return self.async_show_form(
             step_id="notify",
@@ -518,11 +569,7 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                 step_id="test",
                 data_schema=vol.Schema(
                     {
-                        vol.Optional(
-                            "tests", default="notify"
-                        ): selector.SelectSelector(
-                            selector.SelectSelectorConfig(options=["notify"])
-                        ),
+                        vol.Optional("tests", default="notify"): _TESTS_SELECTOR,
                     }
                 ),
                 errors=errors,
@@ -530,10 +577,12 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
         else:
             if user_input["tests"] == "notify":
                 options = dict(self.config_entry.options)
+                now = datetime.datetime.now()
                 notification = {
                     "title": "WebUntis - Test message",
-                    "message": "Subject: Demo\nDate: {}\nTime: {}".format(
-                        *(datetime.datetime.now().strftime("%d.%m.%Y %H:%M:%S").split())
+                    "message": (
+                        f"Subject: Demo\nDate: {now:%d.%m.%Y}\n"
+                        f"Time: {now:%H:%M:%S}"
                     ),
                 }
                 notification["target"] = options.get("notify_target")
@@ -547,12 +596,17 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
             return await self.save({})
 
 
-def _create_subject_list(server):
+def _create_subject_list(server, unique_id):
     """Create a list of subjects."""
-
     subjects = server.subjects
 
-    return [subject.name for subject in subjects]
+    cached = _SUBJECT_CACHE.get(unique_id)
+    if cached and cached[0] is subjects:
+        return cached[1]
+
+    subject_list = [subject.name for subject in subjects]
+    _SUBJECT_CACHE[unique_id] = (subjects, subject_list)
+    return subject_list
 
 
 class CannotConnect(HomeAssistantError):
@@ -589,3 +643,17 @@ class ClassNotFound(HomeAssistantError):
 
 class NoRightsForTimetable(HomeAssistantError):
     """Error to indicate there is no right for timetable."""
+
+
+_ERROR_MAP = {
+    CannotConnect: "cannot_connect",
+    InvalidAuth: "invalid_auth",
+    BadCredentials: "bad_credentials",
+    SchoolNotFound: "school_not_found",
+    NameSplitError: "name_split_error",
+    StudentNotFound: "student_not_found",
+    TeacherNotFound: "teacher_not_found",
+    ClassNotFound: "class_not_found",
+    NoRightsForTimetable: "no_rights_for_timetable",
+}
+_HANDLED_ERRORS = tuple(_ERROR_MAP)
@@ -22,6 +22,7 @@ DEFAULT_OPTIONS = {
 }
 
 NOTIFY_OPTIONS = ["cancelled", "rooms", "lesson change", "code"]
+NOTIFY_OPTIONS_SET = frozenset(NOTIFY_OPTIONS)
 
 ICON_STATUS = "mdi:school-outline"
 ICON_NEXT_CLASS = "mdi:table-clock"
@@ -39,6 +40,8 @@ NAME_TODAY_END = "Today school end"
 
 SCAN_INTERVAL = 60 * 5  # 5min
 
+SESSION_REUSE_TIMEOUT = 60  # 1min
+
 SIGNAL_NAME_PREFIX = f"signal_{DOMAIN}"
 
 DAYS_TO_FUTURE = 30
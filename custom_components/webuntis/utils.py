@@ -4,8 +4,26 @@
 from datetime import datetime
 import logging
 
+import requests
+from requests.adapters import HTTPAdapter
+
 _LOGGER = logging.getLogger(__name__)
 
+# Connection pool shared by all webuntis sessions of the integration.
+_HTTP_ADAPTER = HTTPAdapter(pool_connections=4, pool_maxsize=16, pool_block=False)
+
+
+def create_http_session():
+    """Create a requests session that uses the shared connection pool.
+
+    Every webuntis session gets its own requests session so cookies are not
+    shared between accounts, only the underlying connections are.
+    """
+    http_session = requests.Session()
+    http_session.mount("http://", _HTTP_ADAPTER)
+    http_session.mount("https://", _HTTP_ADAPTER)
+    return http_session
+
 
 def is_service(hass, entry):
     """check whether config entry is a service"""
@@ -101,6 +119,18 @@ def get_schoolyear(school_year, date=datetime.now().date()):
     return None
 
 
+def get_schoolyears(session):
+    """Return the school years of a session, fetched at most once a day."""
+    today = datetime.now().date()
+    cache = getattr(session, "_schoolyears_cache", None)
+    if cache and cache[0] == today:
+        return cache[1]
+
+    school_years = session.schoolyears()
+    session._schoolyears_cache = (today, school_years)
+    return school_years
+
+
 async def async_notify(hass, service, data):
     """Show a notification"""
 